@@ -1,17 +1,63 @@
 import os
 import difflib
+import functools
+import hashlib
+import io
+import itertools
+import json
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Set, Optional
+from operator import attrgetter
+from typing import BinaryIO, Callable, Dict, FrozenSet, Iterable, Iterator, List, Set, Optional, TextIO, Tuple
 
+try:
+    # Необязательная зависимость: в несколько раз быстрее json на больших индексах
+    import orjson
+except ImportError:
+    orjson = None
 
-def find_project_root(required_paths: Optional[List[str]] = None) -> str:
+# Директория, в которой лежит скрипт
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Размер блока, которым файлы читаются при подсчёте хеша
+HASH_CHUNK_SIZE = 65536
+
+# Размер буфера записи файла снимка
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Начиная с этого размера (в символах) diff строится через git: на маленьких
+# файлах запуск процесса обходится дороже, чем difflib
+GIT_DIFF_MIN_SIZE = 16384
+
+# Начиная с этого числа расширений проверка суффикса идёт через множество, а не
+# через str.endswith с кортежем (который перебирает все расширения подряд)
+SUFFIX_SET_THRESHOLD = 8
+
+_GIT = shutil.which('git')
+
+# Разделитель секций текстового снимка и префикс строки с путём файла
+SEPARATOR = '=' * 50 + '\n'
+FILE_PREFIX = 'File: '
+
+# Граница между NEW-блоком/diff и финальным содержимым файла в текстовом снимке
+FINAL_CONTENT_MARKER = "FINAL CONTENT:\n"
+
+
+@functools.lru_cache(maxsize=None)
+def find_project_root(required_paths: Optional[Tuple[str, ...]] = None) -> str:
     """
     Универсальный поиск корня проекта, двигаясь от директории текущего файла вверх.
 
+    Результат кэшируется, поэтому повторные вызовы с теми же путями не обходят
+    файловую систему заново.
+
     Аргументы:
     ---------
-    required_paths : List[str], optional
-        Список директорий и/или файлов, которые должны находиться в корне проекта.
+    required_paths : Tuple[str, ...], optional
+        Кортеж директорий и/или файлов, которые должны находиться в корне проекта.
         Проверка идёт на их существование в текущей директории (относительно которой идёт поиск).
 
     Возвращает:
@@ -23,9 +69,9 @@ def find_project_root(required_paths: Optional[List[str]] = None) -> str:
     if required_paths is None:
         # Если не указали обязательные пути, по умолчанию
         # просто используем папку со скриптом.
-        return os.path.dirname(os.path.abspath(__file__))
+        return _SCRIPT_DIR
 
-    current_dir = os.path.dirname(os.path.abspath(__file__))
+    current_dir = _SCRIPT_DIR
 
     while True:
         # Проверяем, все ли указанные пути существуют в текущей директории
@@ -38,20 +84,389 @@ def find_project_root(required_paths: Optional[List[str]] = None) -> str:
         # Если уже выше некуда подниматься — выходим
         if parent_dir == current_dir:
             # Ничего не нашли, возвращаем директорию скрипта
-            return os.path.dirname(os.path.abspath(__file__))
+            return _SCRIPT_DIR
 
         current_dir = parent_dir
 
 
+def _hash_file(path: str) -> str:
+    """
+    Потоково считает хеш содержимого файла, не загружая его целиком в память.
+
+    Файл читается так же, как в _read_file (UTF-8, текстовый режим с приведением
+    переводов строк к '\n'), поэтому хешируется ровно тот текст, который сохраняется
+    в снимке: _hash_file(path) == _hash_text(_read_file(path)). Для файлов, которые
+    не декодируются как UTF-8, выбрасывается UnicodeDecodeError.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk.encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def _hash_file_safe(path: str) -> Tuple[str, Optional[str], Optional[Exception]]:
+    """
+    Обёртка над _hash_file для пула потоков: ошибка чтения одного файла
+    возвращается вместе с результатом и не прерывает обработку остальных.
+    """
+    try:
+        return path, _hash_file(path), None
+    except Exception as e:
+        return path, None, e
+
+
+def _hash_text(content: str) -> str:
+    """
+    Считает хеш строки так же, как _hash_file считает хеш файла с этим содержимым.
+    """
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _read_file(path: str) -> str:
+    """
+    Читает файл целиком как UTF-8 текст.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _git_unified_diff(prev_content: str, current_content: str) -> Optional[List[str]]:
+    """
+    Строит строки hunk'ов unified diff через `git diff --no-index`.
+
+    Возвращает None, если git недоступен или завершился с ошибкой.
+    """
+    if _GIT is None:
+        return None
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            old_path = os.path.join(tmp, 'old')
+            new_path = os.path.join(tmp, 'new')
+            # difflib сравнивает строки без учёта завершающего перевода строки, поэтому
+            # оба файла дополняются им, чтобы git не сообщал о разнице только в нём
+            with open(old_path, 'w', encoding='utf-8') as f:
+                f.write(prev_content)
+                if prev_content and not prev_content.endswith('\n'):
+                    f.write('\n')
+            with open(new_path, 'w', encoding='utf-8') as f:
+                f.write(current_content)
+                if current_content and not current_content.endswith('\n'):
+                    f.write('\n')
+
+            # Пользовательские настройки git (diff.context, diff.algorithm, GIT_DIFF_OPTS)
+            # не должны влиять на формат вывода: он должен совпадать с difflib
+            env = dict(os.environ, GIT_CONFIG_NOSYSTEM='1', GIT_CONFIG_GLOBAL=os.devnull)
+            env.pop('GIT_DIFF_OPTS', None)
+            result = subprocess.run(
+                [_GIT, 'diff', '--no-index', '--no-color', '--no-ext-diff', '--text',
+                 '-U3', '--diff-algorithm=myers', old_path, new_path],
+                capture_output=True,
+                env=env,
+                encoding='utf-8',
+                errors='replace'
+            )
+    except OSError:
+        return None
+
+    # 0 — файлы совпадают, 1 — есть различия, остальное — ошибка
+    if result.returncode not in (0, 1):
+        return None
+
+    output = result.stdout
+    if output.endswith('\n'):
+        output = output[:-1]
+
+    hunks = []
+    # git разделяет строки только по '\n', в отличие от str.splitlines
+    for line in output.split('\n') if output else ():
+        if line.startswith('\\'):
+            # "\ No newline at end of file": difflib такой строки не выдаёт
+            continue
+        if line.startswith('@@'):
+            # git дописывает к заголовку hunk'а строку-контекст; приводим к виду difflib
+            hunks.append(line[:line.index('@@', 2) + 2])
+        elif hunks:
+            # Строки до первого hunk'а — заголовки git (diff --git, index, ---/+++)
+            hunks.append(line)
+    return hunks
+
+
+def _unified_diff(prev_content: str, current_content: str, path: str) -> Iterator[str]:
+    """
+    Построчно отдаёт unified diff между предыдущим и текущим содержимым файла
+    (строки без завершающего перевода строки).
+
+    Для больших файлов используется `git diff --no-index` (реализация на C), если git
+    установлен; в остальных случаях, а также при ошибке git — difflib. Результат
+    difflib не материализуется в список, а отдаётся по мере построения.
+    """
+    if max(len(prev_content), len(current_content)) >= GIT_DIFF_MIN_SIZE:
+        hunks = _git_unified_diff(prev_content, current_content)
+        if hunks is not None:
+            if hunks:
+                yield f"--- {path}"
+                yield f"+++ {path}"
+                yield from hunks
+            return
+
+    yield from difflib.unified_diff(
+        prev_content.splitlines(),
+        current_content.splitlines(),
+        fromfile=path,
+        tofile=path,
+        lineterm=''
+    )
+
+
+def _make_suffix_matcher(extensions: Iterable[str]) -> Callable[[str], bool]:
+    """
+    Возвращает функцию, проверяющую, оканчивается ли имя файла одним из `extensions`.
+
+    Для небольшого набора расширений используется str.endswith с кортежем. Для большого —
+    срезы имени по каждой из встречающихся длин расширений и поиск во frozenset,
+    так что число проверок зависит от количества разных длин, а не расширений.
+    """
+    exts = tuple(extensions)
+    if len(exts) <= SUFFIX_SET_THRESHOLD:
+        return lambda name: name.endswith(exts)
+
+    ext_set = frozenset(exts)
+    if '' in ext_set:
+        # Пустой суффикс подходит к любому имени (как и в str.endswith)
+        return lambda name: True
+    lengths = sorted({len(ext) for ext in ext_set})
+
+    def matches(name: str) -> bool:
+        for length in lengths:
+            if name[-length:] in ext_set:
+                return True
+        return False
+
+    return matches
+
+
+def _iter_snapshot_sections(lines: Iterator[str]) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Делит строки текстового снимка на секции файлов.
+
+    Заголовок секции — три строки подряд: разделитель, "File: путь", разделитель.
+    Одиночный разделитель или строка "File: " внутри содержимого файла секцию не начинают.
+    Строки до первого заголовка (временная метка и т.п.) пропускаются.
+
+    Возвращает:
+    -----------
+    Iterator[Tuple[str, List[str]]]
+        Пары (путь файла, строки тела секции).
+    """
+    current_file = None
+    body: List[str] = []
+    window: List[str] = []
+
+    for line in lines:
+        window.append(line)
+        while window:
+            if window[0] != SEPARATOR or (len(window) > 1 and not window[1].startswith(FILE_PREFIX)):
+                body.append(window.pop(0))
+            elif len(window) < 3:
+                # Нужна следующая строка, чтобы понять, заголовок ли это
+                break
+            elif window[2] == SEPARATOR:
+                if current_file is not None:
+                    yield current_file, body
+                current_file = window[1][len(FILE_PREFIX):].rstrip('\n')
+                body = []
+                window = []
+            else:
+                body.append(window.pop(0))
+
+    body.extend(window)
+    if current_file is not None:
+        yield current_file, body
+
+
+def _restore_content(body: List[str]) -> Optional[str]:
+    """
+    Восстанавливает финальное содержимое файла по телу его секции в текстовом снимке.
+
+    Возвращает None для удалённых файлов и секций, которые не удалось разобрать.
+    """
+    if not body or body[0] == "DELETED\n":
+        return None
+
+    if body[0] == "NEW\n":
+        # NEW-блок записан как: содержимое, '\n', '\nFINAL CONTENT:\n', содержимое, '\n'.
+        # Длина содержимого вычисляется из длины блока, поэтому строки-маркеры
+        # внутри самого файла границу не сдвигают
+        text = ''.join(body[1:])
+        size = (len(text) - len(FINAL_CONTENT_MARKER) - 3) // 2
+        content = text[:size]
+        if size >= 0 and text == content + '\n\n' + FINAL_CONTENT_MARKER + content + '\n':
+            return content
+        return None
+
+    # Строки diff никогда не бывают пустыми, поэтому первая пустая строка перед
+    # маркером — граница финального содержимого
+    for i in range(len(body) - 1):
+        if body[i] == '\n' and body[i + 1] == FINAL_CONTENT_MARKER:
+            # Писатель добавляет '\n' после содержимого — отрезаем его
+            return ''.join(body[i + 2:])[:-1]
+    return None
+
+
+def _split_excluded_directories(
+        excluded_directories: Optional[List[str]],
+        root_path: str
+) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """
+    Разделяет исключаемые директории на имена и пути.
+
+    Элементы без разделителя пути (например, 'node_modules') сравниваются с именем
+    директории на любом уровне. Элементы с разделителем (например, 'src/generated')
+    приводятся к абсолютным путям относительно `root_path`.
+
+    Возвращает:
+    -----------
+    Tuple[FrozenSet[str], FrozenSet[str]]
+        Множество имён и множество абсолютных путей исключаемых директорий.
+    """
+    names = set()
+    paths = set()
+    for directory in excluded_directories or ():
+        if os.sep in directory or (os.altsep and os.altsep in directory):
+            paths.add(os.path.normpath(os.path.join(root_path, directory)))
+        else:
+            names.add(directory)
+    return frozenset(names), frozenset(paths)
+
+
+def _is_excluded_path(
+        path: str,
+        root_path: str,
+        excluded_dirs: FrozenSet[str],
+        excluded_paths: FrozenSet[str]
+) -> bool:
+    """
+    Проверяет, лежит ли `path` внутри исключённого поддерева (считая от `root_path`).
+    """
+    current = root_path
+    for part in os.path.relpath(path, root_path).split(os.sep):
+        current = os.path.join(current, part)
+        if part in excluded_dirs or current in excluded_paths:
+            return True
+    return False
+
+
+def _scan(
+        path: str,
+        excluded_dirs: FrozenSet[str],
+        excluded_paths: FrozenSet[str],
+        is_excluded_file: Callable[[str], bool],
+        depth: int = 0,
+        sort: bool = False
+) -> Iterator[Tuple[int, str, List[os.DirEntry]]]:
+    """
+    Обходит дерево каталогов через os.scandir (аналог os.walk сверху вниз).
+
+    В отличие от os.walk, отдаёт сами DirEntry: их is_dir()/is_file(), name и path
+    берутся из результата чтения каталога и не требуют дополнительных stat-вызовов.
+
+    Параметры:
+    ----------
+    path : str
+        Директория, с которой начинается обход.
+    excluded_dirs : FrozenSet[str]
+        Имена директорий, в которые не нужно заходить.
+    excluded_paths : FrozenSet[str]
+        Абсолютные пути директорий, в которые не нужно заходить.
+    is_excluded_file : Callable[[str], bool]
+        Проверка имени файла на исключённое расширение (см. _make_suffix_matcher).
+    depth : int
+        Глубина `path` относительно начала обхода (передаётся при рекурсии).
+    sort : bool
+        Сортировать ли файлы каждой директории по имени.
+
+    Возвращает:
+    -----------
+    Iterator[Tuple[int, str, List[os.DirEntry]]]
+        Тройки (глубина, путь к директории, список файлов в ней).
+    """
+    try:
+        it = os.scandir(path)
+    except OSError:
+        # Как и os.walk, молча пропускаем недоступные директории
+        return
+
+    dirs = []
+    files = []
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                # Отсекаем исключённые поддеревья до спуска в них
+                if entry.name not in excluded_dirs and entry.path not in excluded_paths:
+                    dirs.append(entry)
+            elif entry.is_file():
+                if not is_excluded_file(entry.name):
+                    files.append(entry)
+
+    if sort:
+        files.sort(key=attrgetter('name'))
+
+    yield depth, path, files
+
+    for entry in dirs:
+        yield from _scan(entry.path, excluded_dirs, excluded_paths, is_excluded_file, depth + 1, sort)
+
+
+def _structure_entries(depth: int, root: str, files: List[os.DirEntry]) -> Iterator[Tuple[int, str, bool]]:
+    """
+    Превращает одну директорию из _scan в элементы структуры проекта:
+    (глубина, имя, является ли директорией).
+    """
+    yield depth, os.path.basename(root), True
+    for entry in files:
+        yield depth + 1, entry.name, False
+
+
+def _write_structure(out: TextIO, entries: Iterable[Tuple[int, str, bool]], indent: str = '  ') -> None:
+    """
+    Пишет элементы структуры проекта (см. _structure_entries) по строке на элемент;
+    директории помечаются завершающим '/'.
+
+    Параметры:
+    ----------
+    out : TextIO
+        Открытый текстовый файл.
+    entries : Iterable[Tuple[int, str, bool]]
+        Элементы в порядке обхода: (глубина, имя, является ли директорией).
+    indent : str
+        Отступ для вложенных директорий/файлов.
+    """
+    for depth, name, is_dir in entries:
+        out.write(indent * depth)
+        out.write(name)
+        out.write('/\n' if is_dir else '\n')
+
+
 def get_project_structure(
         start_path: str,
         indent: str = '  ',
         excluded_directories: Optional[List[str]] = None,
-        excluded_extensions: Optional[Set[str]] = None
-) -> str:
+        excluded_extensions: Optional[Set[str]] = None,
+        root_path: Optional[str] = None,
+        sort: bool = True,
+        out: Optional[TextIO] = None
+) -> Optional[str]:
     """
     Генерирует строковое представление структуры проекта.
 
+    Если передан `out`, строки структуры сразу пишутся в него (каждая с '\n'), а функция
+    возвращает None; иначе структура собирается и возвращается одной строкой.
+
     Параметры:
     ----------
     start_path : str
@@ -62,35 +477,35 @@ def get_project_structure(
         Список директорий, которые не нужно включать в структуру.
     excluded_extensions : Set[str], optional
         Список расширений файлов, которые не нужно включать.
+    root_path : str, optional
+        Директория, относительно которой задаются исключаемые пути вида 'src/generated'.
+        По умолчанию совпадает с `start_path`.
+    sort : bool
+        Сортировать ли файлы внутри каждой директории по имени. Если порядок
+        не важен, сортировку можно отключить.
+    out : TextIO, optional
+        Открытый текстовый файл, в который пишется структура.
     """
-    if excluded_directories is None:
-        excluded_directories = []
-    if excluded_extensions is None:
-        excluded_extensions = set()
-
-    structure = []
-
-    for root, dirs, files in os.walk(start_path):
-        # Исключаем нежелательные директории
-        dirs[:] = [d for d in dirs if d not in excluded_directories]
-
-        level = root.replace(start_path, '').count(os.sep)
-        indent_str = indent * level
+    start_path = os.path.normpath(start_path)
+    excluded_dirs, excluded_paths = _split_excluded_directories(
+        excluded_directories, root_path if root_path is not None else start_path
+    )
+    is_excluded_file = _make_suffix_matcher(excluded_extensions or ())
 
-        folder = os.path.basename(root)
-        if level == 0:
-            structure.append(f"{folder}/")
-        else:
-            structure.append(f"{indent_str}{folder}/")
+    entries = (
+        item
+        for depth, root, files in _scan(start_path, excluded_dirs, excluded_paths, is_excluded_file, sort=sort)
+        for item in _structure_entries(depth, root, files)
+    )
 
-        subindent = indent * (level + 1)
-        for f in sorted(files):
-            # Пропускаем файлы с нежелательными расширениями
-            if any(f.endswith(ext) for ext in excluded_extensions):
-                continue
-            structure.append(f"{subindent}{f}")
+    if out is not None:
+        _write_structure(out, entries, indent)
+        return None
 
-    return '\n'.join(structure)
+    buffer = io.StringIO()
+    _write_structure(buffer, entries, indent)
+    # Без завершающего перевода строки, как и раньше
+    return buffer.getvalue()[:-1]
 
 
 class ProjectSnapshot:
@@ -107,13 +522,27 @@ class ProjectSnapshot:
             Если None, берётся директория, в которой лежит скрипт.
         """
         # Находим корень проекта (или директорию со скриптом, если required_paths не указаны)
-        self.project_root = find_project_root(required_paths=required_paths)
+        self.project_root = find_project_root(
+            required_paths=tuple(required_paths) if required_paths is not None else None
+        )
 
         # Сохраняем файл снимка в той же директории, где находится скрипт
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        self.snapshot_file = os.path.join(script_dir, snapshot_file)
+        self.snapshot_file = os.path.join(_SCRIPT_DIR, snapshot_file)
+
+        # Состояние для следующего запуска: JSON-индекс файлов и дописываемый
+        # файл с содержимым, куда попадают только новые и изменённые файлы.
+        # Имя файла содержимого хранится в индексе: новый файл (при первом запуске
+        # или сжатии) всегда создаётся под новым именем
+        self.manifest_file = self.snapshot_file + '.idx.json'
+        self.content_file: Optional[str] = None
+        self._content_prefix = os.path.basename(self.snapshot_file) + '.content-'
 
         self.previous_snapshots: Dict[str, str] = {}
+        self.previous_snapshots_hashes: Dict[str, str] = {}
+        # Отпечаток файла (размер, mtime в наносекундах) на момент прошлого снимка
+        self.previous_snapshots_fingerprints: Dict[str, Tuple[int, int]] = {}
+        # Положение содержимого файла в self.content_file: (смещение, длина в байтах)
+        self.previous_snapshots_offsets: Dict[str, Tuple[int, int]] = {}
 
         print(f"\n📁 Корень проекта: {self.project_root}")
         print(f"📄 Файл снимка будет создан в: {self.snapshot_file}")
@@ -122,60 +551,195 @@ class ProjectSnapshot:
 
     def load_previous_snapshots(self) -> None:
         """
-        Считывает предыдущий снимок из файла (если он существует) и
-        заполняет словарь self.previous_snapshots содержимым каждого файла.
+        Загружает состояние предыдущего снимка.
+
+        Если есть JSON-индекс (манифест), из него берутся хеши, отпечатки (размер, mtime) и положение
+        содержимого файлов в self.content_file; само содержимое читается только по запросу.
+        Иначе разбирается текстовый снимок (если он существует): словарь
+        self.previous_snapshots заполняется содержимым каждого файла, а хеши считаются по нему.
         """
+        # Без текстового снимка запуск считается первым, даже если служебные файлы остались
         if not os.path.exists(self.snapshot_file):
             print("ℹ️  Первый запуск - будет создан новый файл снимка")
             return
 
+        if os.path.exists(self.manifest_file):
+            try:
+                self._load_manifest()
+                return
+            except Exception as e:
+                print(f"⚠️  Ошибка при загрузке индекса снимка: {e}")
+                self.content_file = None
+                self.previous_snapshots_hashes = {}
+                self.previous_snapshots_fingerprints = {}
+                self.previous_snapshots_offsets = {}
+
         try:
             with open(self.snapshot_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Отделяем структуру проекта (если есть) от остального содержимого
-                if "Project Structure:" in content:
-                    content = content.split("End Project Structure", 1)[1]
-
-                # Разбиваем на секции по разделителю '====...'
-                sections = content.split('=' * 50 + '\n')
-
-                current_file = None
-                current_content = []
-                in_final_content = False
-
-                for section in sections:
-                    if not section.strip():
-                        continue
-
-                    lines = section.strip().split('\n')
-                    for line in lines:
-                        if line.startswith('File: '):
-                            # Если мы уже обрабатывали какой-то файл, сохраняем его
-                            if current_file and current_content:
-                                self.previous_snapshots[current_file] = '\n'.join(current_content)
-
-                            # Начинаем новую секцию файла
-                            current_file = line.replace('File: ', '').strip()
-                            current_content = []
-                            in_final_content = False
-
-                        elif line.strip() == "FINAL CONTENT:":
-                            # С этого момента идёт финальное содержимое файла
-                            in_final_content = True
-                            current_content = []
-
-                        elif line.strip() and not line.startswith('Snapshot created at:'):
-                            # Добавляем строки в контент, только если находимся в блоке FINAL CONTENT
-                            if in_final_content and not any(line.startswith(x) for x in ['NEW', 'DELETED']):
-                                current_content.append(line)
-
-                # После цикла нужно сохранить последний файл
-                if current_file and current_content:
-                    self.previous_snapshots[current_file] = '\n'.join(current_content)
+                first_line = f.readline()
+                if first_line == "Project Structure:\n":
+                    # Структура проекта пропускается целиком
+                    for line in f:
+                        if line == "End Project Structure\n":
+                            break
+                    lines = f
+                else:
+                    lines = itertools.chain([first_line], f)
+
+                for path, body in _iter_snapshot_sections(lines):
+                    content = _restore_content(body)
+                    if content is not None:
+                        self.previous_snapshots[path] = content
+
+                for path, previous_content in self.previous_snapshots.items():
+                    self.previous_snapshots_hashes[path] = _hash_text(previous_content)
 
         except Exception as e:
             print(f"⚠️  Ошибка при загрузке предыдущего снимка: {e}")
             self.previous_snapshots = {}
+            self.previous_snapshots_hashes = {}
+
+    def _load_manifest(self) -> None:
+        """
+        Читает JSON-индекс вида
+        `{content_file, files: {путь: {hash, size, mtime_ns, content_offset, content_length}}}`.
+        """
+        with open(self.manifest_file, 'rb') as f:
+            data = f.read()
+        index = orjson.loads(data) if orjson is not None else json.loads(data)
+
+        content_file = os.path.join(os.path.dirname(self.snapshot_file), index['content_file'])
+        if not os.path.exists(content_file):
+            raise FileNotFoundError(f"нет файла содержимого {content_file}")
+        self.content_file = content_file
+
+        for path, item in index['files'].items():
+            self.previous_snapshots_hashes[path] = item['hash']
+            self.previous_snapshots_fingerprints[path] = (item['size'], item['mtime_ns'])
+            self.previous_snapshots_offsets[path] = (item['content_offset'], item['content_length'])
+
+    def _write_manifest(
+            self,
+            content_file: str,
+            current_snapshots: Dict[str, Tuple[str, str]],
+            fingerprints: Dict[str, Tuple[int, int]],
+            offsets: Dict[str, Tuple[int, int]]
+    ) -> None:
+        """
+        Атомарно перезаписывает JSON-индекс (через временный файл и os.replace).
+        """
+        files = {}
+        for file_path, (_, digest) in sorted(current_snapshots.items()):
+            size, mtime_ns = fingerprints[file_path]
+            offset, length = offsets[file_path]
+            files[file_path] = {
+                'hash': digest,
+                'size': size,
+                'mtime_ns': mtime_ns,
+                'content_offset': offset,
+                'content_length': length
+            }
+        index = {'content_file': os.path.basename(content_file), 'files': files}
+
+        if orjson is not None:
+            data = orjson.dumps(index)
+        else:
+            data = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _read_previous_content(self, file_path: str, content_file: BinaryIO) -> str:
+        """
+        Возвращает содержимое файла из предыдущего снимка: из разобранного текстового
+        снимка или, если загружен манифест, из файла содержимого (открытого как `content_file`).
+        """
+        if file_path in self.previous_snapshots:
+            return self.previous_snapshots[file_path]
+        offset, length = self.previous_snapshots_offsets[file_path]
+        content_file.seek(offset)
+        return content_file.read(length).decode('utf-8')
+
+    def _new_content_file(self) -> Tuple[str, BinaryIO]:
+        """
+        Создаёт файл содержимого под новым уникальным именем и возвращает (путь, файл),
+        файл открыт в режиме 'w+b'.
+        """
+        fd, path = tempfile.mkstemp(prefix=self._content_prefix, dir=os.path.dirname(self.snapshot_file))
+        return path, os.fdopen(fd, 'w+b')
+
+    def _compact_content_file(self, content_file: str, offsets: Dict[str, Tuple[int, int]]) -> str:
+        """
+        Если устаревшие версии файлов занимают в `content_file` больше места, чем
+        актуальные, копирует актуальное содержимое в новый файл. Исходный файл не
+        меняется, так что текущий индекс остаётся корректным до записи нового.
+
+        Возвращает путь к файлу, на который указывают `offsets` (смещения обновляются на месте).
+        """
+        live_size = sum(length for _, length in offsets.values())
+        if os.path.getsize(content_file) <= 2 * live_size:
+            return content_file
+
+        new_content_file, dst = self._new_content_file()
+        with open(content_file, 'rb') as src, dst:
+            for file_path, (offset, length) in sorted(offsets.items(), key=lambda item: item[1][0]):
+                src.seek(offset)
+                offsets[file_path] = (dst.tell(), length)
+                dst.write(src.read(length))
+        return new_content_file
+
+    def _refresh_manifest(
+            self,
+            current_snapshots: Dict[str, Tuple[str, str]],
+            fingerprints: Dict[str, Tuple[int, int]]
+    ) -> None:
+        """
+        Обновляет индекс, когда содержимое файлов не изменилось, но изменились их
+        отпечатки (например, после touch или переключения ветки): иначе такие файлы
+        хешировались бы заново при каждом запуске.
+        """
+        if all(self.previous_snapshots_fingerprints.get(path) == fingerprints[path] for path in current_snapshots):
+            return
+
+        if self.content_file is not None:
+            content_file_path = self.content_file
+            offsets = {path: self.previous_snapshots_offsets[path] for path in current_snapshots}
+        else:
+            # Предыдущий снимок разобран из текста: переносим его содержимое в новый файл
+            content_file_path, content_file = self._new_content_file()
+            offsets = {}
+            with content_file:
+                for path in sorted(current_snapshots):
+                    data = self.previous_snapshots[path].encode('utf-8')
+                    offsets[path] = (content_file.tell(), len(data))
+                    content_file.write(data)
+
+        self._write_manifest(content_file_path, current_snapshots, fingerprints, offsets)
+        self.content_file = content_file_path
+        self.previous_snapshots = {}
+        self.previous_snapshots_fingerprints = {path: fingerprints[path] for path in current_snapshots}
+        self.previous_snapshots_offsets = offsets
+        self._remove_stale_files()
+
+    def _remove_stale_files(self) -> None:
+        """
+        Удаляет файлы содержимого, на которые не ссылается индекс, и оставшиеся
+        от прерванных запусков временные файлы.
+        """
+        stale = [self.manifest_file + '.tmp', self.snapshot_file + '.tmp']
+        directory = os.path.dirname(self.snapshot_file)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith(self._content_prefix) and path != self.content_file:
+                stale.append(path)
+
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
 
     def create_snapshot(
             self,
@@ -198,7 +762,15 @@ class ProjectSnapshot:
         if excluded_extensions is None:
             excluded_extensions = set()
 
-        current_snapshots = {}
+        excluded_dirs, excluded_paths = _split_excluded_directories(excluded_directories, self.project_root)
+        is_included_file = _make_suffix_matcher(included_extensions)
+        is_excluded_file = _make_suffix_matcher(excluded_extensions)
+
+        # Относительный путь -> (абсолютный путь, хеш содержимого)
+        current_snapshots: Dict[str, Tuple[str, str]] = {}
+        current_fingerprints: Dict[str, Tuple[int, int]] = {}
+        # Кандидаты в порядке обхода: (относительный путь, абсолютный путь, известный хеш или None)
+        candidates: List[Tuple[str, str, Optional[str]]] = []
         changes_detected = False
         new_files = []
         modified_files = []
@@ -206,45 +778,77 @@ class ProjectSnapshot:
 
         print("\n🔍 Сканирование проекта...")
 
+        # Структура проекта собирается попутно с обходом, чтобы не обходить дерево повторно:
+        # (глубина, имя, является ли директорией)
+        structure: List[Tuple[int, str, bool]] = []
+
         # Сбор текущего состояния файлов
         for directory in included_directories:
-            directory_path = os.path.join(self.project_root, directory)
+            directory_path = os.path.normpath(os.path.join(self.project_root, directory))
             if not os.path.exists(directory_path):
                 continue
+            # Не заходим в директорию, если она сама лежит в исключённом поддереве
+            if _is_excluded_path(directory_path, self.project_root, excluded_dirs, excluded_paths):
+                continue
 
-            for root, dirs, files in os.walk(directory_path):
-                # Исключаем нежелательные директории
-                dirs[:] = [d for d in dirs if d not in excluded_directories]
-
-                for file in files:
-                    # Проверяем, подходит ли файл под включаемые и не исключён ли он
-                    if any(file.endswith(ext) for ext in included_extensions):
-                        if any(file.endswith(ext) for ext in excluded_extensions):
-                            continue  # Если расширение из запрещённых, пропускаем
-
-                        file_path = os.path.join(root, file)
+            for depth, root, files in _scan(directory_path, excluded_dirs, excluded_paths, is_excluded_file, sort=True):
+                structure.extend(_structure_entries(depth, root, files))
+                for entry in files:
+                    # Проверяем, подходит ли файл под включаемые расширения
+                    # (исключённые расширения уже отсеяны в _scan)
+                    if is_included_file(entry.name):
+                        file_path = entry.path
                         try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                                rel_path = os.path.relpath(file_path, self.project_root)
-                                current_snapshots[rel_path] = content
+                            rel_path = os.path.relpath(file_path, self.project_root)
+                            # stat() у DirEntry обычно уже закэширован после чтения каталога
+                            st = entry.stat()
+                            fingerprint = (st.st_size, st.st_mtime_ns)
                         except Exception as e:
                             print(f"⚠️  Ошибка при чтении файла {file_path}: {e}")
+                            continue
+
+                        digest = None
+                        if self.previous_snapshots_fingerprints.get(rel_path) == fingerprint:
+                            digest = self.previous_snapshots_hashes.get(rel_path)
+
+                        candidates.append((rel_path, file_path, digest))
+                        current_fingerprints[rel_path] = fingerprint
+
+        # Хешируем изменившиеся файлы параллельно: чтение упирается в ввод-вывод,
+        # а на время read() GIL отпускается. Содержимое читается позже и лишь при записи снимка
+        to_hash = [file_path for _, file_path, digest in candidates if digest is None]
+        hashes: Dict[str, str] = {}
+        if to_hash:
+            max_workers = min(32, (os.cpu_count() or 1) * 4)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_hash_file_safe, file_path) for file_path in to_hash]
+                for future in as_completed(futures):
+                    file_path, digest, error = future.result()
+                    if error is not None:
+                        print(f"⚠️  Ошибка при чтении файла {file_path}: {error}")
+                    else:
+                        hashes[file_path] = digest
+
+        for rel_path, file_path, digest in candidates:
+            if digest is None:
+                digest = hashes.get(file_path)
+                if digest is None:
+                    continue
+            current_snapshots[rel_path] = (file_path, digest)
 
         # Определяем изменения
-        for file_path, current_content in current_snapshots.items():
+        for file_path, (_, current_hash) in current_snapshots.items():
+            prev_hash = self.previous_snapshots_hashes.get(file_path)
             # Проверяем, есть ли файл в предыдущем снимке
-            if file_path not in self.previous_snapshots:
+            if prev_hash is None:
                 new_files.append(file_path)
                 changes_detected = True
-            else:
-                prev_content = self.previous_snapshots[file_path]
-                if prev_content != current_content:
-                    modified_files.append(file_path)
-                    changes_detected = True
+            elif prev_hash != current_hash:
+                modified_files.append(file_path)
+                changes_detected = True
 
         # Проверяем удалённые файлы
-        for old_file in self.previous_snapshots:
+        for old_file in self.previous_snapshots_hashes:
             if old_file not in current_snapshots:
                 deleted_files.append(old_file)
                 changes_detected = True
@@ -267,25 +871,37 @@ class ProjectSnapshot:
 
         if not changes_detected:
             print("\n✅ Изменений не обнаружено")
+            try:
+                self._refresh_manifest(current_snapshots, current_fingerprints)
+            except Exception as e:
+                print(f"⚠️  Ошибка при обновлении индекса снимка: {e}")
             return False
 
         # Запись снимка
         try:
-            with open(self.snapshot_file, 'w', encoding='utf-8') as f:
-                # Записываем структуру проекта
+            new_files_set = set(new_files)
+            modified_files_set = set(modified_files)
+            changed_files = new_files_set | modified_files_set
+            # Если загружен манифест, содержимое неизменённых файлов уже лежит в
+            # self.content_file, и туда дописываются только новые и изменённые файлы
+            # (старые смещения при этом остаются верными). Иначе создаётся новый файл
+            if self.content_file is not None:
+                content_file_path = self.content_file
+                content_file = open(content_file_path, 'a+b')
+            else:
+                content_file_path, content_file = self._new_content_file()
+            offsets: Dict[str, Tuple[int, int]] = {}
+
+            # Снимок пишется во временный файл и подменяет прежний только целиком:
+            # при ошибке предыдущий снимок остаётся нетронутым
+            tmp_snapshot_file = self.snapshot_file + '.tmp'
+            with content_file, \
+                    open(tmp_snapshot_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+                # Записываем структуру проекта, собранную при обходе
                 f.write("Project Structure:\n")
-                f.write("=" * 50 + "\n")
-                for directory in included_directories:
-                    directory_path = os.path.join(self.project_root, directory)
-                    if os.path.exists(directory_path):
-                        f.write(
-                            get_project_structure(
-                                directory_path,
-                                excluded_directories=excluded_directories,
-                                excluded_extensions=excluded_extensions
-                            ) + "\n"
-                        )
-                f.write("=" * 50 + "\n")
+                f.write(SEPARATOR)
+                _write_structure(f, structure)
+                f.write(SEPARATOR)
                 f.write("End Project Structure\n\n")
 
                 # Записываем временную метку
@@ -293,42 +909,63 @@ class ProjectSnapshot:
                 f.write(f"Snapshot created at: {timestamp}\n\n")
 
                 # Записываем файлы
-                for file_path, current_content in sorted(current_snapshots.items()):
-                    f.write('=' * 50 + '\n')
-                    f.write(f"File: {file_path}\n")
-                    f.write('=' * 50 + '\n')
-
-                    if file_path in new_files:
-                        # Новый файл
-                        f.write("NEW\n")
-                        f.write(current_content + '\n')
-                        f.write("\nFINAL CONTENT:\n")
-                        f.write(current_content + '\n')
+                for file_path, (abs_path, current_hash) in sorted(current_snapshots.items()):
+                    if file_path not in changed_files and file_path in self.previous_snapshots_offsets:
+                        # Содержимое не изменилось: берём сохранённое, файл проекта не открываем
+                        offsets[file_path] = self.previous_snapshots_offsets[file_path]
+                        current_content = self._read_previous_content(file_path, content_file)
                     else:
-                        prev_content = self.previous_snapshots.get(file_path, '')
-                        if prev_content != current_content:
-                            # Изменённый файл
-                            diff = list(difflib.unified_diff(
-                                prev_content.splitlines(),
-                                current_content.splitlines(),
-                                fromfile=file_path,
-                                tofile=file_path,
-                                lineterm=''
-                            ))
-                            f.write('\n'.join(diff) + '\n')
-                            f.write("\nFINAL CONTENT:\n")
-                            f.write(current_content + '\n')
-                        else:
-                            # Файл без изменений (добавляем FINAL CONTENT для полноты)
-                            f.write("\nFINAL CONTENT:\n")
-                            f.write(current_content + '\n')
+                        try:
+                            current_content = _read_file(abs_path)
+                        except Exception as e:
+                            # Файл удалили или он стал нечитаемым уже после хеширования:
+                            # пропускаем его, не включая в снимок и индекс
+                            print(f"⚠️  Ошибка при чтении файла {abs_path}: {e}")
+                            del current_snapshots[file_path]
+                            continue
+                        data = current_content.encode('utf-8')
+                        content_file.seek(0, os.SEEK_END)
+                        offsets[file_path] = (content_file.tell(), len(data))
+                        content_file.write(data)
+
+                    # Части секции собираются в список и пишутся одним writelines;
+                    # содержимое не склеивается с '\n', чтобы не копировать его
+                    parts = [SEPARATOR, FILE_PREFIX, file_path, '\n', SEPARATOR]
+
+                    if file_path in new_files_set:
+                        # Новый файл
+                        parts += ["NEW\n", current_content, '\n']
+                    elif file_path in modified_files_set:
+                        # Изменённый файл
+                        f.writelines(parts)
+                        parts = []
+                        prev_content = self._read_previous_content(file_path, content_file)
+                        for line in _unified_diff(prev_content, current_content, file_path):
+                            f.write(line)
+                            f.write('\n')
+                    # Для файла без изменений FINAL CONTENT добавляется для полноты
+
+                    parts += ['\n', FINAL_CONTENT_MARKER, current_content, '\n']
+                    f.writelines(parts)
 
                 # Записываем удалённые файлы
                 for file_path in deleted_files:
-                    f.write('=' * 50 + '\n')
-                    f.write(f"File: {file_path}\n")
-                    f.write('=' * 50 + '\n')
-                    f.write("DELETED\n")
+                    f.writelines([SEPARATOR, FILE_PREFIX, file_path, '\n', SEPARATOR, "DELETED\n"])
+
+            os.replace(tmp_snapshot_file, self.snapshot_file)
+
+            # Индекс фиксируется последним: до этого момента прежний индекс
+            # указывает на прежний, не изменённый сжатием файл содержимого
+            content_file_path = self._compact_content_file(content_file_path, offsets)
+            self._write_manifest(content_file_path, current_snapshots, current_fingerprints, offsets)
+            self.content_file = content_file_path
+            self._remove_stale_files()
+
+            # Записанный снимок становится предыдущим для повторных вызовов
+            self.previous_snapshots = {}
+            self.previous_snapshots_hashes = {path: digest for path, (_, digest) in current_snapshots.items()}
+            self.previous_snapshots_fingerprints = {path: current_fingerprints[path] for path in current_snapshots}
+            self.previous_snapshots_offsets = offsets
 
             print(f"\n💾 Снимок сохранён в: {self.snapshot_file}")
             print(f"⏰ Время создания: {timestamp}")
@@ -336,6 +973,10 @@ class ProjectSnapshot:
 
         except Exception as e:
             print(f"❌ Ошибка при создании снимка: {e}")
+            try:
+                os.remove(self.snapshot_file + '.tmp')
+            except OSError:
+                pass
             return False
 
 